@@ -1,9 +1,20 @@
 # load_dataset_to_mongo.py
 import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+from array import array
+import functools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import MongoClient, InsertOne
+from pymongo.write_concern import WriteConcern
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 # --- Flask App ---
@@ -15,102 +26,356 @@ load_dotenv()
 PROJECT_ID = os.getenv("GOOGLE_PROJECT_ID")
 MONGODB_URI = os.getenv("MONGODB_URI")
 DB_NAME = os.getenv("MONGODB_DATABASE")
+# Bulk loads are fire-and-forget (w=0) unless acknowledged writes are requested
+ACK_WRITES = os.getenv("MONGODB_ACK_WRITES", "false").lower() == "true"
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 # --- Init Mongo ---
-client = MongoClient(MONGODB_URI)
+# zstd (falling back to zlib) shrinks the float-heavy embedding payloads on the wire
+client = MongoClient(
+    MONGODB_URI,
+    compressors="zstd,zlib",
+    maxPoolSize=200,
+    minPoolSize=20,
+    retryWrites=True,
+    serverSelectionTimeoutMS=3000
+)
 db = client[DB_NAME]
+unack_db = client.get_database(DB_NAME, write_concern=WriteConcern(w=0))
 
 # --- Load Sample Datasets ---
+CSV_CHUNK_SIZE = 50_000
+
+def read_csv_filtered(url, filter_chunk, **kwargs):
+    """Parse a CSV in chunks, keeping only what filter_chunk returns for each chunk."""
+    chunks = pd.read_csv(url, chunksize=CSV_CHUNK_SIZE, **kwargs)
+    return pd.concat([filter_chunk(chunk) for chunk in chunks], ignore_index=True)
+
 def load_olympics():
     url = "https://raw.githubusercontent.com/rfordatascience/tidytuesday/master/data/2021/2021-07-27/olympics.csv"
-    df = pd.read_csv(url)
-    df = df[df["season"] == "Summer"]
-    df = df.groupby("noc")["medal"].value_counts().unstack(fill_value=0).reset_index()
+    df = read_csv_filtered(
+        url,
+        lambda chunk: chunk[chunk["season"] == "Summer"],
+        usecols=["noc", "season", "medal"],
+        dtype={"season": "category", "medal": "category"}
+    )
+    df = pd.crosstab(df["noc"], df["medal"])
+    df = df.reindex(columns=["Bronze", "Gold", "Silver"], fill_value=0).reset_index()
     df.columns.name = None
-    df.columns = ["Country", "Bronze", "Gold", "Silver"]
-    df["text"] = df.apply(lambda row:
-        f"{row['Country']} won {row['Gold']} Gold, {row['Silver']} Silver, {row['Bronze']} Bronze medals.",
-        axis=1
+    df = df.rename(columns={"noc": "Country"})
+    df["text"] = (
+        df["Country"] + " won " + df["Gold"].astype(str) + " Gold, "
+        + df["Silver"].astype(str) + " Silver, "
+        + df["Bronze"].astype(str) + " Bronze medals."
     )
     return df[["Country", "text"]], "olympics"
 
 def load_gdelt():
     url = "https://raw.githubusercontent.com/mediagis/nlp-datasets/main/gdelt_sample.csv"
-    df = pd.read_csv(url)
-    df = df[["SQLDATE", "Actor1Name", "Actor2Name", "EventCode", "EventBaseCode", "EventRootCode"]].dropna()
-    df["text"] = df.apply(lambda row: f"On {row['SQLDATE']}, event {row['EventCode']} occurred between {row['Actor1Name']} and {row['Actor2Name']}.", axis=1)
+    df = read_csv_filtered(
+        url,
+        lambda chunk: chunk.dropna(),
+        usecols=["SQLDATE", "Actor1Name", "Actor2Name", "EventCode", "EventBaseCode", "EventRootCode"]
+    )
+    df["text"] = (
+        "On " + df["SQLDATE"].astype(str) + ", event " + df["EventCode"].astype(str)
+        + " occurred between " + df["Actor1Name"].astype(str)
+        + " and " + df["Actor2Name"].astype(str) + "."
+    )
     return df[["text"]], "gdelt"
 
 def load_unsdg():
     url = "https://raw.githubusercontent.com/datasets/sdg/master/data/sdg.csv"
-    df = pd.read_csv(url)
-    df = df[["Goal", "Indicator", "Country", "Value"]].dropna()
-    df["text"] = df.apply(lambda row: f"Goal {row['Goal']} - {row['Indicator']} in {row['Country']} has value {row['Value']}.", axis=1)
+    df = read_csv_filtered(
+        url,
+        lambda chunk: chunk.dropna(),
+        usecols=["Goal", "Indicator", "Country", "Value"]
+    )
+    df["text"] = (
+        "Goal " + df["Goal"].astype(str) + " - " + df["Indicator"].astype(str)
+        + " in " + df["Country"].astype(str) + " has value " + df["Value"].astype(str) + "."
+    )
     return df[["text"]], "unsdg"
 
 # --- Generate Embedding ---
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_BATCH_SIZE = 100  # Gemini caps batched embed requests at 100 items
+EMBEDDING_CONCURRENCY = 20  # Max in-flight embed requests, keeps us under the QPM quota
+EMBED_QUEUE_SIZE = 4  # Embedded batches allowed to wait on the Mongo writer
+# Threads for the blocking embed calls, sized so the semaphore is the only limit
+_embed_pool = ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY)
+
+EMBED_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedcache")
+EMBED_CACHE_PATH = os.path.join(EMBED_CACHE_DIR, "embeddings.sqlite3")
+EMBED_CACHE_LOOKUP_SIZE = 500  # Stay below SQLite's bound-parameter limit
+EMBED_CACHE_MAX_ROWS = 100_000  # ~300 MB of packed 768-dim float32 vectors
+SEARCH_QUERY_TTL = 3600  # Seconds a shared question rewrite stays valid
+
+# --- Embedding Cache ---
+# The cache is only an optimization: SQLite or filesystem errors are logged and
+# treated as misses so they never fail a query or a dataset load. It is a file on
+# the host, so every Gunicorn worker shares it; question rewrites live here too.
+def embedding_cache_key(text):
+    return hashlib.blake2b(f"{EMBEDDING_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+def _pack_embedding(emb):
+    return array("f", emb).tobytes()
+
+def _unpack_embedding(blob):
+    emb = array("f")
+    emb.frombytes(blob)
+    return emb.tolist()
+
+def _init_embed_cache():
+    try:
+        os.makedirs(EMBED_CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(EMBED_CACHE_PATH)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block on concurrent writers
+            conn.execute("DROP TABLE IF EXISTS embeddings")  # Superseded JSON-encoded layout
+            conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_queries "
+                "(question TEXT PRIMARY KEY, search_query TEXT NOT NULL, created REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"Embedding cache disabled: {e}")
+        return False
+
+EMBED_CACHE_ENABLED = _init_embed_cache()
+
+def cache_get_many(keys):
+    """Return a {key: embedding} dict for the keys already in the cache."""
+    found = {}
+    if not EMBED_CACHE_ENABLED:
+        return found
+    keys = list(set(keys))
+    try:
+        conn = sqlite3.connect(EMBED_CACHE_PATH)
+        try:
+            for start in range(0, len(keys), EMBED_CACHE_LOOKUP_SIZE):
+                batch = keys[start:start + EMBED_CACHE_LOOKUP_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, embedding FROM vectors WHERE key IN ({placeholders})", batch
+                )
+                found.update((key, _unpack_embedding(emb)) for key, emb in rows)
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Embedding cache read failed: {e}")
+    return found
+
+def cache_put_many(items):
+    """Store (key, embedding) pairs in the cache, evicting the oldest rows past the cap."""
+    if not EMBED_CACHE_ENABLED:
+        return
+    try:
+        conn = sqlite3.connect(EMBED_CACHE_PATH)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO vectors (key, embedding) VALUES (?, ?)",
+                    [(key, _pack_embedding(emb)) for key, emb in items]
+                )
+                # Rowids grow with each write, so this keeps the newest EMBED_CACHE_MAX_ROWS
+                conn.execute(
+                    "DELETE FROM vectors WHERE rowid <= (SELECT MAX(rowid) FROM vectors) - ?",
+                    (EMBED_CACHE_MAX_ROWS,)
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Embedding cache write failed: {e}")
+
+def rewrite_cache_get(question):
+    """Return the cached search query for a question, or None if missing or expired."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    try:
+        conn = sqlite3.connect(EMBED_CACHE_PATH)
+        try:
+            row = conn.execute(
+                "SELECT search_query FROM search_queries WHERE question = ? AND created > ?",
+                (question, time.time() - SEARCH_QUERY_TTL)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Search query cache read failed: {e}")
+        return None
+    return row[0] if row else None
+
+def rewrite_cache_put(question, search_query):
+    """Store a question rewrite and drop expired ones."""
+    if not EMBED_CACHE_ENABLED:
+        return
+    now = time.time()
+    try:
+        conn = sqlite3.connect(EMBED_CACHE_PATH)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_queries (question, search_query, created) VALUES (?, ?, ?)",
+                    (question, search_query, now)
+                )
+                conn.execute("DELETE FROM search_queries WHERE created <= ?", (now - SEARCH_QUERY_TTL,))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Search query cache write failed: {e}")
+
 def generate_embedding(text):
+    key = embedding_cache_key(text)
+    cached = cache_get_many([key])
+    if key in cached:
+        return cached[key]
     response = genai.embed_content(
-        model="models/embedding-001",
+        model=EMBEDDING_MODEL,
         content=text,
         task_type="retrieval_document"
     )
+    cache_put_many([(key, response["embedding"])])
     return response["embedding"]
 
-# --- Insert to MongoDB ---
-def insert_to_mongodb(df, collection_name):
-    collection = db[collection_name]
-    records = []
-    for _, row in df.iterrows():
+def chunk_texts(texts, size=EMBEDDING_BATCH_SIZE):
+    for start in range(0, len(texts), size):
+        yield texts[start:start + size]
+
+@retry(
+    wait=wait_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    retry=retry_if_exception_type(ResourceExhausted),
+    reraise=True
+)
+async def _embed_batch(texts, semaphore):
+    # google-generativeai 0.3.x has no async embed call, and its async client is
+    # bound to the loop it was created on; run the sync client on a thread instead
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        response = await loop.run_in_executor(_embed_pool, functools.partial(
+            genai.embed_content,
+            model=EMBEDDING_MODEL,
+            content=texts,
+            task_type="retrieval_document"
+        ))
+    return response["embedding"]
+
+async def _embed_and_insert(collection, texts, keys, embeddings):
+    """Pipeline Gemini embedding with Mongo writes through a bounded queue.
+
+    Cached embeddings are written first; each freshly embedded batch is handed
+    to the writer as soon as it completes, so inserts overlap the next requests.
+    Returns counts of rows inserted, distinct texts newly embedded and rows whose
+    embedding failed.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=EMBED_QUEUE_SIZE)
+    occurrences = Counter(keys)
+    text_by_key = dict(zip(keys, texts))
+    # Only embed texts we have never seen, each distinct text once
+    misses = {key: text for key, text in text_by_key.items() if key not in embeddings}
+    stats = {"inserted": 0, "embedded": 0, "failed": 0}
+
+    async def embed_chunk(chunk, semaphore):
+        """Embed a chunk, bisecting on rejected input so one bad text only drops itself.
+
+        Throttling, auth and transport errors fail the whole chunk: splitting
+        would only multiply requests against an API that is already refusing them.
+        """
         try:
-            emb = generate_embedding(row["text"])
-            records.append({
-                "text": row["text"],
-                "embedding": emb
-            })
+            return [(chunk, await _embed_batch([misses[key] for key in chunk], semaphore))]
+        except InvalidArgument as e:
+            if len(chunk) == 1:
+                return [(chunk, e)]
+            mid = len(chunk) // 2
+            halves = await asyncio.gather(embed_chunk(chunk[:mid], semaphore), embed_chunk(chunk[mid:], semaphore))
+            return halves[0] + halves[1]
         except Exception as e:
-            print(f"Failed: {e}")
-    if records:
-        collection.insert_many(records)
-        print(f"Inserted {len(records)} records into {collection_name}.")
+            return [(chunk, e)]
+
+    async def produce():
+        if embeddings:
+            await queue.put(list(embeddings.items()))
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        tasks = [embed_chunk(chunk, semaphore) for chunk in chunk_texts(list(misses))]
+        for next_done in asyncio.as_completed(tasks):
+            for chunk, result in await next_done:
+                if isinstance(result, Exception):
+                    print(f"Failed to embed {len(chunk)} texts: {result}")
+                    stats["failed"] += sum(occurrences[key] for key in chunk)
+                    continue
+                computed = list(zip(chunk, result))
+                stats["embedded"] += len(computed)
+                await loop.run_in_executor(None, cache_put_many, computed)
+                await queue.put(computed)
+        await queue.put(None)
+
+    async def consume():
+        while (batch := await queue.get()) is not None:
+            ops = [
+                InsertOne({"text": text_by_key[key], "embedding": emb})
+                for key, emb in batch
+                for _ in range(occurrences[key])
+            ]
+            await loop.run_in_executor(None, functools.partial(collection.bulk_write, ops, ordered=False))
+            stats["inserted"] += len(ops)
+
+    await asyncio.gather(produce(), consume())
+    return stats
+
+# --- Insert to MongoDB ---
+def insert_to_mongodb(df, collection_name):
+    collection = (db if ACK_WRITES else unack_db)[collection_name]
+    texts = df["text"].tolist()
+    keys = [embedding_cache_key(text) for text in texts]
+    embeddings = cache_get_many(keys)
+    stats = asyncio.run(_embed_and_insert(collection, texts, keys, embeddings))
+    if stats["inserted"]:
+        if ACK_WRITES:
+            print(f"Inserted {stats['inserted']} records into {collection_name}.")
+        else:
+            print(f"Queued {stats['inserted']} unacknowledged inserts into {collection_name}.")
+    if stats["failed"]:
+        print(f"Skipped {stats['failed']} records in {collection_name} whose embedding failed.")
+    return stats
+
 @app.route("/create-index/<dataset>", methods=["POST"])
 def create_index(dataset):
-    from pymongo.operations import IndexModel
-
-    collection = db[dataset]
     vector_index = {
         "name": f"{dataset}_vector_index",
+        "type": "vectorSearch",
         "definition": {
-            "mappings": {
-                "dynamic": True,
-                "fields": {
-                    "embedding": {
-                        "type": "knnVector",
-                        "dimensions": 768,  # or 768 for Vertex embeddings
-                        "similarity": "cosine"
-                    }
+            "fields": [
+                {
+                    "type": "vector",
+                    "path": "embedding",
+                    "numDimensions": 768,  # or 768 for Vertex embeddings
+                    "similarity": "cosine",
+                    "quantization": "scalar"  # Atlas keeps int8 vectors in the search index
                 }
-            }
+            ]
         }
     }
     try:
-        collection.create_index(
-            [("embedding", "knnVector")],
-            name=vector_index["name"]
-        )
+        db.command({"createSearchIndexes": dataset, "indexes": [vector_index]})
         return jsonify({"message": f"Vector index {vector_index['name']} created."})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # --- MongoDB Vector Search ---
-def query_mongodb(query, dataset="olympics", top_k=5):
+def query_mongodb(query, dataset="olympics", top_k=5, num_candidates=None):
     # Convert the user question to a search query using Gemini
     search_query = convert_question_to_search_query(query)
     emb = generate_embedding(search_query)
     collection = db[dataset]
     index_name = f"{dataset}_vector_index"
+    if num_candidates is None:
+        num_candidates = max(100, top_k * 10)
     try:
         results = collection.aggregate([
             {
@@ -118,10 +383,12 @@ def query_mongodb(query, dataset="olympics", top_k=5):
                     "index": index_name,
                     "path": "embedding",
                     "queryVector": emb,
-                    "numCandidates": 100,
+                    "numCandidates": num_candidates,
                     "limit": top_k
                 }
-            }
+            },
+            # Only ship back what callers use, not the 768-dim embedding
+            {"$project": {"text": 1, "_id": 0, "score": {"$meta": "vectorSearchScore"}}}
         ])
         return list(results)
     except Exception as e:
@@ -131,19 +398,34 @@ def query_mongodb(query, dataset="olympics", top_k=5):
         traceback.print_exc()
         return []
 GEMINI_MODEL = "models/gemini-1.5"  # Use the correct model name for Gemini Flash
+# Built once and shared across requests
+_gen_model = genai.GenerativeModel(GEMINI_MODEL)
+SEARCH_QUERY_CACHE_SIZE = 4096
+
+# Per-worker LRU in front of the shared SQLite cache, which all Gunicorn workers see
+@functools.lru_cache(maxsize=SEARCH_QUERY_CACHE_SIZE)
+def _rewrite_question(question):
+    # Raises on failure so the fallback below is never memoized
+    cached = rewrite_cache_get(question)
+    if cached is not None:
+        return cached
+    model = _gen_model
+    prompt = f"""
+    Convert the following user question into a concise search query or keywords suitable for semantic vector search in a dataset. Remove unnecessary words and focus on the main topic or entities.
+
+    User question: {question}
+
+    Output only the search query, nothing else.
+    """
+    response = model.generate_content(prompt)
+    search_query = response.text.strip()
+    rewrite_cache_put(question, search_query)
+    return search_query
+
 def convert_question_to_search_query(question):
     """Use Gemini to convert a user question into a concise search query for vector search."""
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        prompt = f"""
-        Convert the following user question into a concise search query or keywords suitable for semantic vector search in a dataset. Remove unnecessary words and focus on the main topic or entities.
-
-        User question: {question}
-
-        Output only the search query, nothing else.
-        """
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return _rewrite_question(question)
     except Exception as e:
         print(f"Failed to convert question to search query: {e}")
         return question
@@ -151,7 +433,7 @@ def convert_question_to_search_query(question):
 def generate_ai_response(query, context):
     """Generate a formal AI answer using Gemini, tailored for vector search context"""
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
+        model = _gen_model
         prompt = f"""
         You are an expert data analyst. Given the following context retrieved from a vector search in a dataset, answer the user's question in a formal, well-structured manner suitable for a professional report.
 
@@ -183,8 +465,14 @@ def load(dataset):
         df, name = load_unsdg()
     else:
         return jsonify({"error": "Unknown dataset"}), 400
-    insert_to_mongodb(df, name)
-    return jsonify({"message": f"{name} dataset loaded and inserted"})
+    stats = insert_to_mongodb(df, name)
+    if stats["failed"] and not stats["embedded"]:
+        return jsonify({"error": f"Embedding failed for all new {name} records", **stats}), 500
+    if ACK_WRITES:
+        message = f"{name} dataset loaded and inserted"
+    else:
+        message = f"{name} dataset loaded; queued {stats['inserted']} unacknowledged inserts"
+    return jsonify({"message": message, "acknowledged": ACK_WRITES, **stats})
 
 @app.route("/analyze", methods=["POST"])
 def analyze_dataset():
@@ -195,14 +483,14 @@ def analyze_dataset():
     try:
         collection = db[dataset_name]
         
-        # Get total count
-        total_records = collection.count_documents({})
+        # Get total count from collection metadata
+        total_records = collection.estimated_document_count()
         
         if total_records == 0:
             return jsonify({"error": "Dataset not found or empty"}), 404
         
         # Get sample documents for analysis
-        sample_docs = list(collection.find().limit(1000))
+        sample_docs = list(collection.find({}, {"embedding": 0, "_id": 0}).limit(1000))
         
         # Analyze the data
         analysis = analyze_documents(sample_docs)
@@ -223,71 +511,48 @@ def analyze_documents(docs):
             "correlations": []
         }
     
-    # Get all unique fields
-    all_fields = set()
-    for doc in docs:
-        all_fields.update(doc.keys())
-    
-    all_fields.discard('_id')  # Remove MongoDB _id field
-    all_fields.discard('embedding')  # Remove embedding field
+    df = pd.DataFrame(docs).drop(columns=["_id", "embedding"], errors="ignore")
+    df = df.mask(df.eq(""))  # Treat empty strings as missing
     
     # Analyze each field
-    field_analysis = {}
-    total_missing = 0
-    
-    for field in all_fields:
-        values = []
-        for doc in docs:
-            value = doc.get(field)
-            if value is not None and value != '':
-                values.append(value)
-            else:
-                total_missing += 1
-        
-        if values:
-            field_analysis[field] = {
-                'values': values,
-                'unique_count': len(set(values)),
-                'total_count': len(values),
-                'missing_count': len(docs) - len(values)
-            }
+    unique_counts = df.nunique()
+    total_counts = df.notna().sum()
+    total_missing = int(df.isna().sum().sum())
+    fields = total_counts[total_counts > 0].index
     
     # Generate trend data (use text field for word count trends)
     text_field = None
-    for field, analysis in field_analysis.items():
-        if field == 'text' or any(isinstance(v, str) and len(v) > 20 for v in analysis['values'][:5]):
-            text_field = field
-            break
+    if "text" in fields:
+        text_field = "text"
+    else:
+        for field in fields:
+            head = df[field].dropna().head(5)
+            if head.map(lambda v: isinstance(v, str) and len(v) > 20).any():
+                text_field = field
+                break
     
     trend_data = {"labels": [], "values": []}
-    if text_field and len(field_analysis[text_field]['values']) >= 10:
+    if text_field and total_counts[text_field] >= 10:
         # Create trend based on text length or word count
-        values = field_analysis[text_field]['values'][:10]
+        word_counts = df[text_field].dropna().head(10).astype(str).str.split().str.len()
         trend_data = {
-            "labels": [f"Record {i+1}" for i in range(len(values))],
-            "values": [len(str(v).split()) for v in values]
+            "labels": [f"Record {i+1}" for i in range(len(word_counts))],
+            "values": [int(n) for n in word_counts]
         }
     
     # Generate distribution data
     distribution_data = {"labels": [], "values": []}
     
     # Find a good categorical field for distribution
-    categorical_field = None
-    for field, analysis in field_analysis.items():
-        if (analysis['unique_count'] < analysis['total_count'] * 0.5 and 
-            analysis['unique_count'] > 1 and 
-            analysis['unique_count'] <= 20):
-            categorical_field = field
-            break
+    unique, total = unique_counts[fields], total_counts[fields]
+    candidates = unique[(unique < total * 0.5) & (unique > 1) & (unique <= 20)]
+    categorical_field = candidates.index[0] if len(candidates) else None
     
     if categorical_field:
-        values = field_analysis[categorical_field]['values']
-        from collections import Counter
-        counter = Counter(str(v) for v in values)
-        most_common = counter.most_common(8)
+        most_common = df[categorical_field].dropna().astype(str).value_counts().head(8)
         distribution_data = {
-            "labels": [item[0] for item in most_common],
-            "values": [item[1] for item in most_common]
+            "labels": most_common.index.tolist(),
+            "values": [int(n) for n in most_common]
         }
     else:
         # Default distribution if no good categorical field
@@ -298,23 +563,17 @@ def analyze_documents(docs):
     
     # Calculate data types
     data_types = {}
-    for field, analysis in field_analysis.items():
+    for field in fields:
+        values = df[field].dropna()
         # Check if field is mostly numeric
-        numeric_count = 0
-        for value in analysis['values']:
-            try:
-                float(str(value))
-                numeric_count += 1
-            except (ValueError, TypeError):
-                pass
-        
-        if numeric_count > len(analysis['values']) * 0.8:
+        numeric_count = int(pd.to_numeric(values.astype(str), errors="coerce").notna().sum())
+        if numeric_count > len(values) * 0.8:
             data_types[field] = numeric_count
     
     return {
         "summary": {
             "totalRecords": len(docs),
-            "uniqueValues": sum(analysis['unique_count'] for analysis in field_analysis.values()),
+            "uniqueValues": int(unique_counts[fields].sum()),
             "missingValues": total_missing,
             "dataTypes": data_types
         },
@@ -328,8 +587,10 @@ def list_datasets():
     """Return a list of available datasets (collections) in the database."""
     collections = db.list_collection_names()
     dataset_list = []
-    for name in collections:
-        count = db[name].count_documents({})
+    # Count collections concurrently; PyMongo releases the GIL while waiting on the network
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        counts = executor.map(lambda name: (name, db[name].estimated_document_count()), collections)
+    for name, count in counts:
         dataset_list.append({
             "id": name,
             "name": name.capitalize(),
@@ -352,11 +613,11 @@ def query():
         return jsonify({"error": "No query provided"}), 400
 
     # Get vector search results
-    vector_results = query_mongodb(query, dataset)
+    vector_results = query_mongodb(query, dataset, top_k=5)
 
     # Generate AI response using Gemini
     if vector_results:
-        context = "\n".join([result.get("text", "") for result in vector_results[:3]])
+        context = "\n".join(result.get("text", "") for result in vector_results[:3])
         ai_response = generate_ai_response(query, context)
         return jsonify({
             "ai_response": ai_response,
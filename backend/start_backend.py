@@ -6,7 +6,24 @@ This script initializes and starts the backend server with MongoDB vector search
 
 import os
 import sys
-from load_dataset_to_mongo import app
+import importlib.util
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# gthread workers let RTT-bound handlers (Gemini, MongoDB) overlap instead of queueing
+# Run through this interpreter so a venv works without being activated
+GUNICORN_CMD = [
+    sys.executable, "-m", "gunicorn",
+    "-k", "gthread",
+    "-w", "2",
+    "--threads", "32",
+    "-b", "0.0.0.0:5000",
+    "--chdir", BACKEND_DIR,
+    "load_dataset_to_mongo:app",
+]
 
 def check_environment():
     """Check if all required environment variables are set"""
@@ -33,9 +50,17 @@ def check_environment():
     return True
 
 def main():
+    dev_mode = "--dev" in sys.argv[1:]
     print("🚀 Starting BotForge Backend Server...")
     print("=" * 50)
     
+    # Check Gunicorn is importable before handing over to it
+    if not dev_mode and importlib.util.find_spec("gunicorn") is None:
+        print("❌ Gunicorn is not installed for this Python interpreter.")
+        print(f"   Install it with: {sys.executable} -m pip install -r requirements.txt")
+        print("   Or run the Flask development server: python start_backend.py --dev")
+        sys.exit(1)
+    
     # Check environment
     if not check_environment():
         sys.exit(1)
@@ -49,7 +74,10 @@ def main():
     
     print("\n🌐 Server starting on http://localhost:5000")
     print("   - CORS enabled for frontend integration")
-    print("   - Debug mode: ON")
+    if dev_mode:
+        print("   - Debug mode: ON (Flask development server)")
+    else:
+        print("   - Gunicorn: 2 workers x 32 threads")
     
     print("\n📋 Available endpoints:")
     print("   POST /load/<dataset>     - Load predefined datasets")
@@ -60,8 +88,13 @@ def main():
     
     print("\n" + "=" * 50)
     
-    # Start the Flask app
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if dev_mode:
+        # Start the Flask development server
+        from load_dataset_to_mongo import app
+        app.run(host='0.0.0.0', port=5000, debug=True)
+    else:
+        # Hand the process over to Gunicorn
+        os.execvp(GUNICORN_CMD[0], GUNICORN_CMD)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file